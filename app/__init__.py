@@ -2,9 +2,12 @@
 from flask import Flask
 from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
+from app.parsing import ParsingService
 
 db = SQLAlchemy()
 cache = Cache()  # Global cache instance
+parsing_service = ParsingService()  # Process pool for HTML parsing
+CACHE_KEY_PREFIX = 'flask_cache_'  # Prefix Flask-Caching puts on every Redis key
 
 
 def create_app():
@@ -21,12 +24,24 @@ def create_app():
     app.config['CACHE_REDIS_DB'] = 0
     app.config['CACHE_REDIS_URL'] = 'redis://localhost:6379/0'
     app.config['CACHE_DEFAULT_TIMEOUT'] = 86400
+    app.config['CACHE_KEY_PREFIX'] = CACHE_KEY_PREFIX
+
+    # Configure the HTML parsing process pool
+    app.config['PARSER_MAX_WORKERS'] = 2  # Worker processes
+    app.config['PARSER_MAX_PENDING'] = 8  # Jobs allowed to queue behind busy workers
+    app.config['PARSER_SUBMIT_TIMEOUT'] = 2.0  # Seconds to wait for a queue slot before rejecting
+    app.config['PARSER_RESULT_TIMEOUT'] = 30.0  # Seconds to wait for a parse to finish
 
     cache.init_app(app)  # Ensure cache is initialized
     db.init_app(app)  # Ensure database is initialized
+    parsing_service.init_app(app)  # Ensure parser pool is configured
 
     register_blueprints(app)  # Import routes AFTER Flask is initialized
 
+    # Build the related-topic index in the background so no request waits on it
+    from app.related import related_index  # Delayed import to avoid circular issue
+    related_index.start()
+
     return app
 
 def register_blueprints(app):
@@ -0,0 +1,131 @@
+import math
+import random
+import time
+from redis.exceptions import LockError
+from app import cache
+from app.database import redis_client
+
+CACHE_TTL = 86400  # Base lifetime of cached topic data (1 day)
+TTL_JITTER = 0.1  # Spread expiries by +/-10% so keys written together don't expire together
+XFETCH_BETA = 1.0  # >1 refreshes earlier, <1 later
+STALE_GRACE = 0.1  # Entries stay in Redis this fraction past their logical expiry, served while one reader refreshes
+# Seconds one reader may hold the right to compute a key. A cold compute can take
+# 0.1s throttle + 25s Wikipedia request + 2s parser queue + 30s parse, so leave headroom.
+REFRESH_LOCK_TIMEOUT = 120
+MISS_WAIT_TIMEOUT = 30  # Seconds a reader waits on another reader's computation before giving up
+MISS_POLL_INTERVAL = 0.05  # Seconds between cache checks while waiting
+MAX_CACHE_TTL = int(CACHE_TTL * (1 + TTL_JITTER) * (1 + STALE_GRACE)) + 1  # Longest lifetime any entry can get
+
+
+def cache_set(key, value, delta, ttl=CACHE_TTL):
+    """
+    Caches a value with the seconds it took to compute (`delta`) and its logical expiry.
+    The TTL is jittered so a burst of writes doesn't expire in the same instant, and
+    the Redis key outlives the logical expiry by a grace period so a reader can
+    still refresh it while everyone else is served the old value.
+    """
+    ttl = ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+    entry = {"value": value, "delta": delta, "expiry": time.time() + ttl}
+    cache.set(key, entry, timeout=int(ttl * (1 + STALE_GRACE)) + 1)
+
+
+class CacheBusyError(RuntimeError):
+    """Raised when a value is still being computed by another reader after MISS_WAIT_TIMEOUT."""
+
+
+def refresh_lock(key):
+    """
+    Returns the Redis lock that picks the single reader allowed to compute `key`.
+    Each holder stores its own token, so releasing after the lock expired can't
+    delete a lock another reader has since taken.
+    """
+    return redis_client.lock(f"refresh:{key}", timeout=REFRESH_LOCK_TIMEOUT, blocking=False)
+
+
+def release_lock(lock):
+    """Releases a refresh lock if this reader still owns it."""
+    try:
+        lock.release()
+    except LockError:
+        print(f"Refresh lock '{lock.name}' expired before the compute finished.")
+
+
+def is_cache_entry(entry):
+    """True for values written by `cache_set`; older raw entries are treated as misses."""
+    return isinstance(entry, dict) and entry.keys() == {"value", "delta", "expiry"}
+
+
+def should_refresh_early(entry):
+    """XFetch: refresh with a probability that rises as expiry nears, sooner for costly values."""
+    # 1 - random() is in (0, 1], so the log is defined and never positive
+    return time.time() - entry["delta"] * XFETCH_BETA * math.log(1 - random.random()) >= entry["expiry"]
+
+
+def cached_fetch(key, compute, ttl=CACHE_TTL):
+    """
+    Returns the cached value for `key`, computing and caching it on a miss.
+
+    Shortly before expiry (or during the grace period after it) one reader, picked
+    by XFetch and a Redis lock, recomputes the value while every other reader keeps
+    getting the cached one. On a hard miss the same lock lets only one reader
+    compute; the others wait for its result and raise CacheBusyError if it takes
+    longer than MISS_WAIT_TIMEOUT. `compute` returning None is not cached.
+    """
+    entry = cache.get(key)
+
+    if is_cache_entry(entry):
+        if not should_refresh_early(entry):
+            return entry["value"]
+
+        # Only the reader that wins the lock recomputes; the rest serve the cached value
+        lock = refresh_lock(key)
+        if not lock.acquire():
+            return entry["value"]
+
+        print(f"Refreshing '{key}' ahead of expiry.")
+        try:
+            value = compute_and_cache(key, compute, ttl)
+            return value if value is not None else entry["value"]
+        except Exception as e:
+            print(f"Early refresh of '{key}' failed, serving cached value: {e}")
+            return entry["value"]
+        finally:
+            release_lock(lock)
+
+    return compute_on_miss(key, compute, ttl)
+
+
+def compute_on_miss(key, compute, ttl=CACHE_TTL):
+    """
+    Computes a missing value in one reader while the others wait for its result.
+    Waiters only compute if they take over the lock, so a slow compute never
+    turns into a stampede.
+    """
+    deadline = time.monotonic() + MISS_WAIT_TIMEOUT
+
+    while True:
+        lock = refresh_lock(key)
+        if lock.acquire():
+            try:
+                return compute_and_cache(key, compute, ttl)
+            finally:
+                release_lock(lock)
+
+        time.sleep(MISS_POLL_INTERVAL)
+        entry = cache.get(key)
+        if is_cache_entry(entry):
+            return entry["value"]
+
+        if time.monotonic() >= deadline:
+            raise CacheBusyError(f"'{key}' is still being computed by another request")
+
+
+def compute_and_cache(key, compute, ttl=CACHE_TTL):
+    """Computes a value, timing it so the cost can drive early refresh, and caches it."""
+    start = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - start
+
+    if value is not None:
+        cache_set(key, value, delta, ttl)
+    return value
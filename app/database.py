@@ -1,8 +1,10 @@
 import sqlite3
 import json
+import math
 import redis
 from datetime import datetime
-from app import db
+from itertools import groupby
+from app import db, CACHE_KEY_PREFIX
 from app.models import Summary
 from app.models import Article
 
@@ -11,6 +13,26 @@ redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=T
 
 DB_FILE = "instance/app.db"
 
+# Links further into the lead than this many anchors count for half as much
+LINK_POSITION_DECAY = 50
+
+# Stay under SQLite's limit on bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+
+# Ranked internal links, one row per (topic, linked_topic)
+LINK_RANKS_TABLE = """
+CREATE TABLE IF NOT EXISTS link_ranks (
+    topic TEXT NOT NULL,
+    linked_topic TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    first_position INTEGER NOT NULL,
+    occurrences INTEGER NOT NULL,
+    popularity INTEGER NOT NULL,
+    PRIMARY KEY (topic, rank)
+)
+"""
+LINK_RANKS_INDEX = "CREATE INDEX IF NOT EXISTS idx_link_ranks_linked_topic ON link_ranks (linked_topic)"
+
 def create_tables():
     """Creates the necessary database tables if they don't exist."""
     conn = sqlite3.connect(DB_FILE)
@@ -37,6 +59,15 @@ def create_tables():
     )
     """)
 
+    # Table for storing ranked internal links
+    cursor.execute(LINK_RANKS_TABLE)
+    cursor.execute(LINK_RANKS_INDEX)
+
+    # Move links from the old JSON column, then rank everything against the full link graph
+    backfilled = backfill_links(cursor)
+    reranked_topics = rerank_links(cursor)
+    print(f"Backfilled links for {backfilled} topics, re-ranked links for {len(reranked_topics)} topics.")
+
     # Table for storing summaries
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS summary (
@@ -51,6 +82,9 @@ def create_tables():
     conn.commit()
     conn.close()
 
+    # Cached pages hold the old ranks; a client paging across them would skip or repeat links
+    invalidate_links_pages(reranked_topics)
+
 def store_article(topic, content):
     """Stores ONLY the Wikipedia article intro in the database."""
 
@@ -80,30 +114,159 @@ def store_article(topic, content):
 
 
 
+def link_score(first_position, occurrences, popularity):
+    """Relevance of a link: frequent, popular targets near the top of the lead rank first."""
+    return (occurrences + math.log1p(popularity)) / (1 + first_position / LINK_POSITION_DECAY)
+
+
+def link_popularity(cursor, topic, linked_topics):
+    """Counts, for each target, how many other stored topics link to it."""
+    popularity = {}
+    linked_topics = list(linked_topics)
+    for start in range(0, len(linked_topics), SQLITE_MAX_PARAMS):
+        chunk = linked_topics[start:start + SQLITE_MAX_PARAMS]
+        cursor.execute(f"""
+        SELECT linked_topic, COUNT(*) FROM link_ranks
+        WHERE linked_topic IN ({", ".join("?" * len(chunk))}) AND topic != ?
+        GROUP BY linked_topic
+        """, (*chunk, topic))
+        popularity.update(cursor.fetchall())
+    return popularity
+
+
+def rank_topic_links(cursor, topic, links, popularity=None):
+    """
+    Scores a topic's links and rewrites its `link_ranks` rows in rank order.
+    Popularity is the number of other stored topics linking to the same target,
+    read at the time this runs unless a precomputed `popularity` dict is passed.
+    """
+    if popularity is None:
+        popularity = link_popularity(cursor, topic, [link["linked_topic"] for link in links])
+
+    scored_links = []
+    for link in links:
+        target_popularity = popularity.get(link["linked_topic"], 0)
+        score = link_score(link["first_position"], link["occurrences"], target_popularity)
+        scored_links.append((score, link, target_popularity))
+
+    # Ties fall back to lead order, then name, so ranks are deterministic
+    scored_links.sort(key=lambda item: (-item[0], item[1]["first_position"], item[1]["linked_topic"]))
+
+    cursor.execute("DELETE FROM link_ranks WHERE topic = ?", (topic,))
+    cursor.executemany("""
+    INSERT INTO link_ranks (topic, linked_topic, rank, first_position, occurrences, popularity)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        (topic, link["linked_topic"], rank, link["first_position"], link["occurrences"], popularity)
+        for rank, (_, link, popularity) in enumerate(scored_links, start=1)
+    ])
+    return len(scored_links)
+
+
 def store_links(topic, links):
     """
-    Stores all Wikipedia internal links for a topic.
+    Stores ranked Wikipedia internal links for a topic.
+
+    `links` is a list of dicts with `linked_topic`, `first_position` and
+    `occurrences`. Each link gets a stable 1-based `rank` for pagination.
+    Popularity is frozen when the topic is stored, so topics stored early rank
+    against a smaller link graph until `rerank_links()` is run.
+    Returns True if the links were stored.
     """
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
-    # Store links in JSON format
-    json_links = json.dumps(links)
-
     try:
-        cursor.execute("""
-        UPDATE articles SET internal_links = ?
-        WHERE topic = ?
-        """, (json_links, topic))  # Updates only the internal_links field
+        cursor.execute(LINK_RANKS_TABLE)
+        cursor.execute(LINK_RANKS_INDEX)
+
+        stored = rank_topic_links(cursor, topic, links)
 
         conn.commit()
-        print(f"Stored internal links for '{topic}' in database.")
-    except sqlite3.IntegrityError:
-        print(f"Article '{topic}' not found, skipping link storage.")
+        print(f"Stored {stored} ranked internal links for '{topic}' in database.")
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Failed to store links for '{topic}': {e}")
+        return False
     finally:
         conn.close()
 
 
+def backfill_links(cursor):
+    """
+    Copies links stored as JSON in `articles.internal_links` into `link_ranks`.
+    The old lists carry no ordering metadata, so list order stands in for lead
+    position. Topics that already have ranked links are left alone.
+    """
+    cursor.execute("PRAGMA table_info(articles)")
+    if "internal_links" not in [column[1] for column in cursor.fetchall()]:
+        return 0
+
+    cursor.execute("""
+    SELECT topic, internal_links FROM articles
+    WHERE internal_links IS NOT NULL
+    AND topic NOT IN (SELECT DISTINCT topic FROM link_ranks)
+    """)
+    backfilled = 0
+    for topic, json_links in cursor.fetchall():
+        try:
+            names = json.loads(json_links)
+        except ValueError:
+            print(f"Skipping unreadable stored links for '{topic}'.")
+            continue
+
+        links = [
+            {"linked_topic": name, "first_position": position, "occurrences": 1}
+            for position, name in enumerate(dict.fromkeys(names))
+        ]
+        rank_topic_links(cursor, topic, links)
+        backfilled += 1
+
+    return backfilled
+
+
+def rerank_links(cursor):
+    """
+    Recomputes popularity and ranks for every stored topic against the current link graph.
+    Returns the topics that were re-ranked.
+    """
+    # Each topic links a target at most once, so its own row is the one to leave out
+    cursor.execute("SELECT linked_topic, COUNT(*) FROM link_ranks GROUP BY linked_topic")
+    in_degree = dict(cursor.fetchall())
+
+    cursor.execute("""
+    SELECT topic, linked_topic, first_position, occurrences FROM link_ranks ORDER BY topic
+    """)
+    rows = cursor.fetchall()
+
+    topics = []
+    for topic, topic_rows in groupby(rows, key=lambda row: row[0]):
+        links = [
+            {"linked_topic": linked_topic, "first_position": first_position, "occurrences": occurrences}
+            for _, linked_topic, first_position, occurrences in topic_rows
+        ]
+        popularity = {link["linked_topic"]: in_degree[link["linked_topic"]] - 1 for link in links}
+        rank_topic_links(cursor, topic, links, popularity)
+        topics.append(topic)
+
+    return topics
+
+
+def invalidate_links_pages(topics):
+    """Deletes every cached page of links for the given topics, as tracked in their `links_pages:` sets."""
+    try:
+        for topic in topics:
+            page_keys = redis_client.smembers(f"links_pages:{topic}")
+            pipe = redis_client.pipeline()
+            if page_keys:
+                pipe.delete(*[CACHE_KEY_PREFIX + page_key for page_key in page_keys])
+            pipe.delete(f"links_pages:{topic}")
+            pipe.execute()
+    except redis.exceptions.RedisError as e:
+        print(f"Could not invalidate cached link pages: {e}")
+
+
 
 def store_summaries(topic, summaries_dict):
     """
@@ -187,19 +350,31 @@ def get_article(topic):
 
 
 
-def get_links(topic):
+def get_links(topic, limit=None, after=0):
     """
-    Retrieves internal links stored as a JSON string in the `articles` table.
-    Returns JSON-formatted string or None if no links exist.
+    Retrieves a page of ranked internal links for a topic.
+    Returns up to `limit` link names with rank greater than `after`, in rank
+    order, or None if no links are stored for the topic.
     """
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     try:
-        cursor.execute("SELECT internal_links FROM articles WHERE topic = ?", (topic,))
-        row = cursor.fetchone()
-        if row and row[0]:  # Ensure data exists
-            return row[0]  # Return JSON string as-is (not converting to list)
+        cursor.execute("""
+        SELECT linked_topic FROM link_ranks
+        WHERE topic = ? AND rank > ?
+        ORDER BY rank
+        LIMIT ?
+        """, (topic, after, limit if limit is not None else -1))
+        rows = cursor.fetchall()
+        if rows:
+            return [row[0] for row in rows]
+
+        if after:
+            # Past the last page of an existing link list
+            cursor.execute("SELECT 1 FROM link_ranks WHERE topic = ? LIMIT 1", (topic,))
+            if cursor.fetchone():
+                return []
 
         return None  # Return None if no links exist
 
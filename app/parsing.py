@@ -0,0 +1,173 @@
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from bs4 import BeautifulSoup
+import markdownify
+
+
+class ParserBusyError(RuntimeError):
+    """Raised when the parsing queue is full and a job could not be admitted in time."""
+
+
+def parse_intro(html):
+    """
+    Converts the intro section of a parsed Wikipedia page to markdown.
+    Collects paragraphs until <div class='mw-heading mw-heading2'>. Returns None if there is no intro.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    content_div = soup.select_one("div.mw-parser-output")
+
+    if not content_div:
+        return None
+
+    # Extract all paragraphs until reaching <div class="mw-heading mw-heading2">
+    intro_text = []
+    for element in content_div.children:
+        # Stop at <div class="mw-heading mw-heading2">
+        if element.name == "div" and "mw-heading2" in element.get("class", []):
+            break
+
+        # Capture paragraph text
+        if element.name == "p" and element.text.strip():
+            intro_text.append(str(element))
+
+    if not intro_text:
+        return None
+
+    # Convert HTML to markdown format
+    markdown_text = markdownify.markdownify("".join(intro_text), heading_style="ATX")
+
+    # Remove Wikipedia citations like [1], [2], etc.
+    markdown_text = re.sub(r"\[\d+\]", "", markdown_text)
+
+    # Strip extra whitespace
+    return markdown_text.strip()
+
+
+def parse_links(html):
+    """
+    Extracts internal links from the top-level paragraphs of a parsed Wikipedia page.
+    Returns a list of dicts with `linked_topic`, `first_position` and `occurrences`,
+    or None if the page has no content.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    content_div = soup.select_one("div.mw-parser-output")
+    if not content_div:
+        return None
+
+    # Record where each target first appears and how often it is linked
+    link_stats = {}
+    position = 0
+    for p in content_div.find_all("p", recursive=False):
+        for a in p.find_all("a", href=True):
+            href = a["href"]
+            if href.startswith("/wiki/") and ":" not in href:
+                topic_name = href.split("/wiki/")[-1].split("#")[0]
+                stats = link_stats.setdefault(topic_name, {
+                    "linked_topic": topic_name,
+                    "first_position": position,
+                    "occurrences": 0
+                })
+                stats["occurrences"] += 1
+                position += 1
+
+    return list(link_stats.values())
+
+
+class ParsingService:
+    """
+    Runs CPU-bound HTML parsing in a persistent process pool so request threads
+    don't hold the GIL while BeautifulSoup and markdownify work.
+
+    At most `max_workers + max_pending` jobs are admitted at once. Further
+    submissions wait up to `submit_timeout` seconds for a slot, then raise
+    ParserBusyError so callers can shed load instead of piling up. If a worker
+    dies (e.g. OOM-killed on a huge page) the pool is replaced and the job
+    fails with ParserBusyError.
+    """
+
+    def __init__(self, app=None):
+        self.max_workers = 2
+        self.max_pending = 8
+        self.submit_timeout = 2.0
+        self.result_timeout = 30.0
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Reads pool sizing from the Flask config."""
+        self.max_workers = app.config.get("PARSER_MAX_WORKERS", self.max_workers)
+        self.max_pending = app.config.get("PARSER_MAX_PENDING", self.max_pending)
+        self.submit_timeout = app.config.get("PARSER_SUBMIT_TIMEOUT", self.submit_timeout)
+        self.result_timeout = app.config.get("PARSER_RESULT_TIMEOUT", self.result_timeout)
+
+    def _get_executor(self):
+        """Starts the pool on first use and returns it with its admission semaphore."""
+        with self._lock:
+            if self._executor is None:
+                # Request threads start the pool, so don't fork a threaded process
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("forkserver")
+                )
+                self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+            return self._executor, self._slots
+
+    def _discard_executor(self, executor):
+        """Drops a broken pool so the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # Another thread already replaced it
+            self._executor = None
+            self._slots = None
+        executor.shutdown(wait=False)
+        print("Parser worker died; the process pool will be recreated.")
+
+    def run(self, func, *args):
+        """Runs `func(*args)` in the pool and waits for the result."""
+        executor, slots = self._get_executor()
+
+        if not slots.acquire(timeout=self.submit_timeout):
+            raise ParserBusyError(f"Parsing queue is full ({self.max_workers + self.max_pending} jobs in flight)")
+
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._discard_executor(executor)
+            raise ParserBusyError("Parser pool was broken and is being restarted")
+        except Exception:
+            slots.release()
+            raise
+
+        # Free the slot when the job finishes, even if the caller gives up waiting
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            raise ParserBusyError(f"Parsing did not finish within {self.result_timeout}s")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise ParserBusyError("A parser worker died and the pool is being restarted")
+
+    def parse_intro(self, html):
+        """Parses an intro section in the pool. See `parse_intro`."""
+        return self.run(parse_intro, html)
+
+    def parse_links(self, html):
+        """Parses internal links in the pool. See `parse_links`."""
+        return self.run(parse_links, html)
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,308 @@
+import re
+import sqlite3
+import threading
+import zlib
+from urllib.parse import unquote
+import numpy as np
+from scipy import sparse
+from app.database import DB_FILE
+
+N_FEATURES = 2 ** 18  # Hashed vocabulary size
+MERGE_MIN_ROWS = 1000  # Pending rows allowed before folding them into the main matrix
+MERGE_GROWTH = 0.1  # ...or this fraction of the main matrix, whichever is larger
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+MARKDOWN_LINK_TARGET = re.compile(r"\]\([^)]*\)")
+STOPWORDS = frozenset("""
+about above after again against also among and any are because been before being below between both but
+can could did does doing down during each few for from further had has have having her here hers him his
+how into its itself just more most not now off once only other our out over own same she should some such
+than that the their them then there these they this those through too under until very was were what when
+where which while who whom why will with would you your known called used include including wiki
+""".split())
+
+
+class IndexNotReadyError(RuntimeError):
+    """Raised when the related index is queried before its initial build has finished."""
+
+
+def topic_key(topic):
+    """
+    Normalizes stored topics and URL-style link targets to the same key.
+    Like Wikipedia titles, only the first letter is case-insensitive.
+    """
+    key = unquote(topic).replace("_", " ").strip()
+    return key[:1].upper() + key[1:]
+
+
+def hash_features(text):
+    """Returns the hashed feature indices and sublinear term frequencies of a text."""
+    text = MARKDOWN_LINK_TARGET.sub("]", text)  # Drop link URLs left by markdownify
+
+    counts = {}
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < 3 or token in STOPWORDS:
+            continue
+        feature = zlib.crc32(token.encode()) % N_FEATURES
+        counts[feature] = counts.get(feature, 0) + 1
+
+    indices = np.array(sorted(counts), dtype=np.int32)
+    tf = 1 + np.log(np.array([counts[i] for i in indices], dtype=np.float32))
+    return indices, tf.astype(np.float32)
+
+
+def compute_idf(df, n):
+    """Smoothed inverse document frequency for `n` documents."""
+    return (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+
+def weigh_rows(rows, idf):
+    """Builds L2-normalized TF-IDF rows from (feature indices, tf) pairs as a CSR matrix."""
+    lengths = np.array([len(row[0]) for row in rows], dtype=np.int64)
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+
+    if indptr[-1]:
+        indices = np.concatenate([row[0] for row in rows])
+        data = np.concatenate([row[1] for row in rows]) * idf[indices]
+    else:
+        indices = np.zeros(0, dtype=np.int32)
+        data = np.zeros(0, dtype=np.float32)
+
+    norms = np.sqrt(np.bincount(np.repeat(np.arange(len(rows)), lengths), weights=data ** 2,
+                                minlength=len(rows))).astype(np.float32)
+    norms[norms == 0] = 1
+    data /= np.repeat(norms, lengths)
+
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), N_FEATURES))
+
+
+class RelatedIndex:
+    """
+    TF-IDF similarity index over stored article intros.
+
+    Documents are hashed into sparse vectors. The bulk of them live in a
+    column-major main matrix weighted with the IDF frozen at the last merge;
+    topics ingested since then sit in a small pending matrix. Queries only touch
+    the columns the query topic uses, so a lookup stays cheap at 100k topics.
+
+    The initial build and later merges run on background threads and swap the
+    new matrix in, so queries and ingests never wait on them. Each process keeps
+    its own index; `add` only updates the process that did the ingest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._building = False
+        self._merging = False
+        self._buffered = []  # Ingests that arrived during the initial build
+        self._topics = []  # Row id -> topic name
+        self._ids = {}  # Topic key -> row id
+        self._rows = []  # Row id -> (feature indices, tf)
+        self._df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._idf = np.ones(N_FEATURES, dtype=np.float32)
+        self._main = None
+        self._n_main = 0
+        self._stale = np.zeros(0, dtype=bool)  # Main rows superseded by a pending row
+        self._pending_ids = []
+        self._pending = None
+        self._changed = set()  # Rows added since the running merge took its snapshot
+
+    @property
+    def ready(self):
+        """True once the initial build has finished."""
+        return self._ready
+
+    def start(self):
+        """Builds the index from every stored article on a background thread."""
+        with self._lock:
+            if self._ready or self._building:
+                return
+            self._building = True
+
+        threading.Thread(target=self._build, name="related-index-build", daemon=True).start()
+
+    def add(self, topic, text):
+        """Indexes a newly ingested or updated intro. A no-op if the index was never started."""
+        features = hash_features(text)
+
+        with self._lock:
+            if not self._ready:
+                if self._building:
+                    self._buffered.append((topic, features))  # Applied once the build lands
+                return
+
+            self._add_pending_locked(topic, features)
+
+    def contains(self, topic):
+        """True if `topic` is indexed. Raises IndexNotReadyError while the initial build is running."""
+        with self._lock:
+            if not self._ready:
+                raise IndexNotReadyError("Related index is still being built")
+            return topic_key(topic) in self._ids
+
+    def most_similar(self, topic, k=10, candidates=None):
+        """
+        Returns up to `k` (topic, score) pairs most similar to `topic`, best first.
+        If `candidates` is given (e.g. internal links), only those are ranked and
+        their original spelling is returned. Returns None if `topic` isn't indexed.
+        Raises IndexNotReadyError while the initial build is running.
+        """
+        with self._lock:
+            if not self._ready:
+                raise IndexNotReadyError("Related index is still being built")
+
+            row_id = self._ids.get(topic_key(topic))
+            if row_id is None:
+                return None
+
+            scores = self._scores_locked(weigh_rows([self._rows[row_id]], self._idf))[0]
+            scores[row_id] = -np.inf
+
+            names = self._topics
+            if candidates is not None:
+                names = {}
+                for candidate in candidates:
+                    candidate_id = self._ids.get(topic_key(candidate))
+                    if candidate_id is not None:
+                        names.setdefault(candidate_id, candidate)
+                mask = np.ones(len(scores), dtype=bool)
+                mask[list(names)] = False
+                scores[mask] = -np.inf
+
+            k = min(k, len(scores))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            return [(names[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def _build(self):
+        """Reads and vectorizes all stored intros, then installs them as the main matrix."""
+        try:
+            # Read-only so a missing database isn't created as a side effect
+            conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+            try:
+                articles = conn.execute("SELECT topic, full_text FROM articles").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Could not load articles for related index: {e}")
+            articles = []
+
+        try:
+            topics, ids, rows = [], {}, []
+            df = np.zeros(N_FEATURES, dtype=np.int32)
+            for topic, full_text in articles:
+                key = topic_key(topic)
+                if key in ids:
+                    continue
+                features = hash_features(full_text)
+                ids[key] = len(topics)
+                topics.append(topic)
+                rows.append(features)
+                df[features[0]] += 1
+
+            idf = compute_idf(df, len(rows))
+            main = weigh_rows(rows, idf).tocsc()
+        except Exception as e:
+            print(f"Failed to build related index: {e}")
+            with self._lock:
+                self._building = False
+            return
+
+        with self._lock:
+            self._topics, self._ids, self._rows, self._df = topics, ids, rows, df
+            self._idf, self._main, self._n_main = idf, main, len(rows)
+            self._stale = np.zeros(len(rows), dtype=bool)
+            self._ready = True
+            self._building = False
+
+            for topic, features in self._buffered:
+                self._add_pending_locked(topic, features)
+            self._buffered = []
+
+        print(f"Related index built over {len(topics)} topics.")
+
+    def _add_pending_locked(self, topic, features):
+        """Adds a row to the pending matrix and starts a merge once it has grown enough."""
+        row_id = self._add_locked(topic, features)
+        if row_id < self._n_main:
+            self._stale[row_id] = True
+        if row_id not in self._pending_ids:
+            self._pending_ids.append(row_id)
+        self._changed.add(row_id)
+        self._pending = None
+
+        if not self._merging and len(self._pending_ids) >= max(MERGE_MIN_ROWS, self._n_main * MERGE_GROWTH):
+            self._merging = True
+            threading.Thread(target=self._merge, name="related-index-merge", daemon=True).start()
+
+    def _add_locked(self, topic, features):
+        """Stores a document's term frequencies and updates document frequencies."""
+        indices, tf = features
+        key = topic_key(topic)
+
+        row_id = self._ids.get(key)
+        if row_id is None:
+            row_id = len(self._topics)
+            self._ids[key] = row_id
+            self._topics.append(topic)
+            self._rows.append(None)
+        else:
+            self._df[self._rows[row_id][0]] -= 1
+
+        self._rows[row_id] = (indices, tf)
+        self._df[indices] += 1
+        return row_id
+
+    def _merge(self):
+        """Recomputes IDF and rebuilds the main matrix from a snapshot, then swaps it in."""
+        with self._lock:
+            rows = list(self._rows)
+            df = self._df.copy()
+            self._changed = set()
+
+        try:
+            idf = compute_idf(df, len(rows))
+            main = weigh_rows(rows, idf).tocsc()
+        except Exception as e:
+            print(f"Failed to merge related index: {e}")
+            with self._lock:
+                self._merging = False
+            return
+
+        with self._lock:
+            n = len(rows)
+            self._idf, self._main, self._n_main = idf, main, n
+
+            # Rows written after the snapshot stay pending and shadow their main row
+            self._pending_ids = [i for i in self._pending_ids if i in self._changed]
+            self._stale = np.zeros(n, dtype=bool)
+            self._stale[[i for i in self._pending_ids if i < n]] = True
+            self._pending = None
+            self._merging = False
+
+        print(f"Related index merged, {n} topics in the main matrix.")
+
+    def _scores_locked(self, query):
+        """Cosine scores of every indexed topic against each row of `query`."""
+        scores = np.full((query.shape[0], len(self._topics)), -np.inf, dtype=np.float32)
+        columns = np.unique(query.indices)
+
+        if self._n_main:
+            main_scores = (self._main[:, columns] @ query[:, columns].T).T.toarray()
+            main_scores[:, self._stale] = -np.inf
+            scores[:, :self._n_main] = main_scores
+
+        if self._pending_ids:
+            if self._pending is None:
+                self._pending = weigh_rows([self._rows[i] for i in self._pending_ids], self._idf)
+            scores[:, self._pending_ids] = (self._pending @ query.T).T.toarray()
+
+        return scores
+
+
+related_index = RelatedIndex()  # Shared per-process index, built in the background by create_app
@@ -1,15 +1,43 @@
 from flask import Blueprint, request, jsonify
 from app.wikipedia import get_article_text, get_internal_links, get_summary, get_summarized_article  # Import functions properly
+from app.parsing import ParserBusyError
+from app.caching import CacheBusyError
+from app.related import related_index, IndexNotReadyError
+from app.database import get_links
 
 
 main = Blueprint("main", __name__)
 
+MAX_LINKS_PER_PAGE = 1000  # Upper bound on max_links, which is part of the cache key
+
+@main.errorhandler(ParserBusyError)
+def parser_busy(error):
+    """Sheds load with a 503 when the parsing pool is saturated."""
+    print(f"Rejecting request, parser is busy: {error}")
+    return jsonify({"error": "Server is busy ingesting articles, please retry shortly"}), 503, {"Retry-After": "1"}
+
+@main.errorhandler(CacheBusyError)
+def cache_busy(error):
+    """Returns a 503 instead of recomputing when another request is still computing the same data."""
+    print(f"Rejecting request, data is still being computed: {error}")
+    return jsonify({"error": "This topic is still being fetched, please retry shortly"}), 503, {"Retry-After": "5"}
+
 @main.route("/topic/<topic>", methods=["GET"])
 def topic_data(topic):
     """
     Retrieves only the stored intro section and internal links.
     """
-    max_links = int(request.args.get("max_links", 1000))  # Default: 1000 links
+    try:
+        max_links = int(request.args.get("max_links", 1000))  # Default: 1000 links
+        cursor = int(request.args.get("cursor", 0))  # Rank of the last link already seen
+    except ValueError:
+        return jsonify({"error": "max_links and cursor must be integers"}), 400
+
+    if max_links < 1 or cursor < 0:
+        return jsonify({"error": "max_links must be positive and cursor non-negative"}), 400
+
+    max_links = min(max_links, MAX_LINKS_PER_PAGE)
+
     nocache = request.args.get("nocache", "false").lower() == "true"
 
     print(f"\n Request received for topic: {topic} (nocache={nocache})")
@@ -20,14 +48,15 @@ def topic_data(topic):
     if not article_intro:
         return jsonify({"error": f"Error retrieving data for topic: {topic}"}), 500
 
-    # Retrieve internal links
-    internal_links = get_internal_links(topic) if not nocache else None
+    # Retrieve one page of internal links, most relevant first
+    links_page = get_internal_links(topic, limit=max_links, cursor=cursor) if not nocache else None
 
     # Return ONLY the intro and links (Remove full_text & official_title)
     data = {
         "topic": topic,
         "intro_text": article_intro,  # Returns only the intro
-        "internal_links": internal_links[:max_links] if internal_links else []
+        "internal_links": links_page["links"] if links_page else [],
+        "next_cursor": links_page["next_cursor"] if links_page else None
     }
 
     print(f"Successfully retrieved intro section for '{topic}'.")
@@ -56,3 +85,40 @@ def get_summary_route(topic):
 
 
 
+@main.route("/related/<topic>", methods=["GET"])
+def related_topics(topic):
+    """
+    Returns the stored topics most similar to a topic, from the local TF-IDF index.
+    With links_only=true, ranks only the topic's internal links that are stored.
+    Never fetches from Wikipedia: topics that haven't been ingested get a 404.
+    """
+    try:
+        k = int(request.args.get("k", 10))  # Default: 10 topics
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+
+    if k < 1:
+        return jsonify({"error": "k must be positive"}), 400
+
+    links_only = request.args.get("links_only", "false").lower() == "true"
+
+    print(f"\n Request received for related topics: {topic} (k={k}, links_only={links_only})")
+
+    try:
+        if not related_index.contains(topic):
+            return jsonify({"error": f"Topic '{topic}' has not been ingested yet"}), 404
+
+        # Stored links only; get_internal_links would fetch missing ones from Wikipedia
+        candidates = (get_links(topic) or []) if links_only else None
+
+        related = related_index.most_similar(topic, k=k, candidates=candidates)
+    except IndexNotReadyError:
+        return jsonify({"error": "Related index is still building, please retry shortly"}), 503, {"Retry-After": "5"}
+
+    if related is None:
+        return jsonify({"error": f"Topic '{topic}' has not been ingested yet"}), 404
+
+    return jsonify({
+        "topic": topic,
+        "related": [{"topic": name, "score": round(score, 4)} for name, score in related]
+    })
@@ -1,13 +1,12 @@
 import json
 import time
 import requests
-from bs4 import BeautifulSoup
-import markdownify
 from flask import current_app
-from app import cache
+from app import cache, parsing_service
+from app.caching import cached_fetch, MAX_CACHE_TTL
 from app.llm import summarize_text
-from app.database import store_article, get_article, store_links, get_links, get_summary, store_summaries
-import re
+from app.database import store_article, get_article, store_links, get_links, get_summary, store_summaries, redis_client, invalidate_links_pages
+from app.related import related_index
 
 # Wikipedia API Endpoint
 WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
@@ -15,6 +14,7 @@ HEADERS = {
     "User-Agent": "WikiTutorBot/1.0 (andy.n.brandt@gmail.com)",
     "Accept-Encoding": "gzip"
 }
+REQUEST_TIMEOUT = (5, 20)  # Seconds to connect and between bytes read; bounds the refresh lock budget
 
 
 def get_cache():
@@ -25,21 +25,29 @@ def get_cache():
         return cache
 
 
-def get_internal_links(topic):
-    """Fetch internal links for a Wikipedia article, using Flask-Caching."""
-    cache = get_cache()
+def get_internal_links(topic, limit=None, cursor=0):
+    """
+    Fetch a page of ranked internal links for a Wikipedia article, using Flask-Caching.
+    Returns a dict with the page's `links` and the `next_cursor` for the following
+    page (None on the last page). `limit` and `cursor` are pushed down to the database.
+    """
+    page_key = f"links:{topic}:{cursor}:{limit}"
 
-    cached_links = cache.get(f"links:{topic}")
-    if cached_links:
-        print(f"Retrieved internal links for '{topic}' from Redis cache.")
-        return cached_links
+    def load_page():
+        page = load_internal_links(topic, limit, cursor)
+        track_links_page(topic, page_key)  # Right before the page is cached
+        return page
 
+    return cached_fetch(page_key, load_page)
+
+
+def load_internal_links(topic, limit, cursor):
+    """Loads a page of internal links from the database, or from Wikipedia if none are stored."""
     # Check the database
-    stored_links = get_links(topic)
-    if stored_links:
+    stored_page = read_links_page(topic, limit, cursor)
+    if stored_page:
         print(f"Retrieved internal links for '{topic}' from database.")
-        cache.set(f"links:{topic}", stored_links, timeout=86400)  # Cache for 1 day
-        return stored_links
+        return stored_page
 
     # Fetch from Wikipedia API if not cached
     print(f"Fetching internal links for '{topic}' from Wikipedia API...")
@@ -53,48 +61,76 @@ def get_internal_links(topic):
     }
 
     time.sleep(0.1)
-    response = requests.get(WIKI_API_URL, params=params, headers=HEADERS)
+    response = requests.get(WIKI_API_URL, params=params, headers=HEADERS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
     data = response.json()
 
     if "parse" not in data:
         return None
 
-    soup = BeautifulSoup(data["parse"]["text"]["*"], "lxml")
-    content_div = soup.select_one("div.mw-parser-output")
-    if not content_div:
+    # Parse off the request thread; raises ParserBusyError if the pool is saturated
+    link_stats = parsing_service.parse_links(data["parse"]["text"]["*"])
+    if link_stats is None:
         return None
 
-    seen_links = set()
-    for p in content_div.find_all("p", recursive=False):
-        for a in p.find_all("a", href=True):
-            href = a["href"]
-            if href.startswith("/wiki/") and ":" not in href:
-                topic_name = href.split("/wiki/")[-1].split("#")[0]
-                seen_links.add(topic_name)
+    # Store in database; the caller caches the page
+    if not store_links(topic, link_stats):
+        return None  # Not cached, so the next request retries
+
+    page = read_links_page(topic, limit, cursor)
+    if page is None:
+        if link_stats:
+            return None  # Stored links could not be read back
+        page = {"links": [], "next_cursor": None}  # The article genuinely has no links
 
-    final_links = list(seen_links)
+    print(f"Stored internal links for '{topic}' in database.")
 
-    # Store in database & Cache
-    store_links(topic, final_links)
-    cache.set(f"links:{topic}", final_links, timeout=86400)  # Cache for 1 day
+    return page
 
-    print(f"Stored internal links for '{topic}' in database and Redis.")
 
-    return final_links
+def read_links_page(topic, limit, cursor):
+    """Reads one page of ranked links from the database, or None if none are stored."""
+    # Ask for one extra row to find out whether another page follows
+    links = get_links(topic, limit + 1 if limit is not None else None, cursor)
+    if links is None:
+        return None
+
+    has_more = limit is not None and len(links) > limit
+    if has_more:
+        links = links[:limit]
+
+    return {
+        "links": links,
+        "next_cursor": cursor + len(links) if has_more else None  # Ranks are contiguous
+    }
+
+
+def track_links_page(topic, page_key):
+    """
+    Remembers a cached page key so the topic's pages can be invalidated together.
+    Called every time a page is cached, so the set always outlives its pages.
+    """
+    pipe = redis_client.pipeline()
+    pipe.sadd(f"links_pages:{topic}", page_key)
+    pipe.expire(f"links_pages:{topic}", MAX_CACHE_TTL)
+    pipe.execute()
 
 
 
 
 def get_article_text(topic):
     """Fetch Wikipedia article intro from cache or database. If missing, fetch it from Wikipedia and store only the intro."""
+    return cached_fetch(f"article:{topic}", lambda: load_article_text(topic))
+
+
+def load_article_text(topic):
+    """Loads the article intro from the database, or from Wikipedia if it isn't stored."""
     print(f"Checking database for '{topic}' intro section...")
 
     stored_article = get_article(topic)  # Ensure this only returns the intro
 
     if stored_article:
         print(f"Retrieved intro section of '{topic}' from database.")
-        cache.set(f"article:{topic}", stored_article, timeout=86400)  # Cache it for fast access
         return stored_article
     else:
         print(f"Article '{topic}' not found in database. Fetching intro from Wikipedia...")
@@ -105,7 +141,7 @@ def get_article_text(topic):
     if intro_text:
         print(f"Storing intro section of '{topic}' in database...")
         store_article(topic, intro_text)  # Store **only the intro** in SQLite
-        cache.set(f"article:{topic}", intro_text, timeout=86400)  # Cache intro
+        related_index.add(topic, intro_text)  # Keep the similarity index current
         return intro_text
     else:
         print(f"Could not retrieve intro section for '{topic}'.")
@@ -124,7 +160,7 @@ def fetch_wikipedia_intro(topic):
         "redirects": 1
     }
 
-    response = requests.get(WIKI_API_URL, params=params, headers=HEADERS)
+    response = requests.get(WIKI_API_URL, params=params, headers=HEADERS, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()
     data = response.json()
 
@@ -132,38 +168,13 @@ def fetch_wikipedia_intro(topic):
         print(f"Wikipedia API did not return expected data for '{topic}'")
         return None
 
-    soup = BeautifulSoup(data["parse"]["text"]["*"], "lxml")
-    content_div = soup.select_one("div.mw-parser-output")
-
-    if not content_div:
-        print(f"No content found for '{topic}'")
-        return None
+    # Parse and convert off the request thread; raises ParserBusyError if the pool is saturated
+    markdown_text = parsing_service.parse_intro(data["parse"]["text"]["*"])
 
-    # Extract all paragraphs until reaching <div class="mw-heading mw-heading2">
-    intro_text = []
-    for element in content_div.children:
-        # Stop at <div class="mw-heading mw-heading2">
-        if element.name == "div" and "mw-heading2" in element.get("class", []):
-            print("Stopping extraction at first <div class='mw-heading mw-heading2'>")
-            break
-
-        # Capture paragraph text
-        if element.name == "p" and element.text.strip():
-            intro_text.append(str(element))
-
-    if not intro_text:
+    if not markdown_text:
         print(f"No valid intro text found for '{topic}'")
         return None
 
-    # Convert HTML to markdown format
-    markdown_text = markdownify.markdownify("".join(intro_text), heading_style="ATX")
-
-    # Remove Wikipedia citations like [1], [2], etc.
-    markdown_text = re.sub(r"\[\d+\]", "", markdown_text)
-
-    # Strip extra whitespace
-    markdown_text = markdown_text.strip()
-
     # Debugging: Print the extracted intro
     print(f"Final Extracted Intro (first 500 chars):\n{markdown_text[:500]}...")
 
@@ -211,7 +222,7 @@ def invalidate_cache(topic):
     """Manually remove a topic from Redis cache."""
     cache = get_cache()
     cache.delete(f"article:{topic}")
-    cache.delete(f"links:{topic}")
+    invalidate_links_pages([topic])
     print(f"Cache invalidated for '{topic}'. Fresh data will be fetched next time.")
 
 
@@ -219,14 +230,14 @@ if __name__ == "__main__":
     topic = "Logic"  # Change this for testing different articles
 
     print(f"\n Checking database and cache for internal links for: {topic}")
-    internal_links = get_internal_links(topic)
+    internal_links = get_internal_links(topic, limit=10)["links"]
 
     if internal_links:
         print(f"Internal links retrieved for '{topic}' ({len(internal_links)} found).")
     else:
         print(f"No internal links found for '{topic}'.")
 
-    print("\n Internal Links (First 10 for preview):", internal_links[:10])
+    print("\n Internal Links (Top 10 for preview):", internal_links)
 
     print(f"\n Checking database and cache for article text for: {topic}")
     article_text = get_article_text(topic)
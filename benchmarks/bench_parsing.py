@@ -0,0 +1,155 @@
+"""
+Benchmark: latency of cache-hit requests while cold ingests parse large pages.
+
+Reader threads send GET /topic/<topic> through the Flask test client against a
+warmed in-process cache, on a fixed schedule. Latency is measured from each
+request's scheduled arrival, so time spent waiting for the GIL (before or during
+the request) is counted. Ingest threads repeatedly parse a large synthetic
+Wikipedia page, either inline on the thread or through the ParsingService pool.
+
+Usage:
+    python -m benchmarks.bench_parsing --readers 8 --ingesters 4 --duration 10
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import threading
+import time
+
+from app import cache, create_app, parsing_service
+from app.caching import cache_set
+from app.parsing import ParserBusyError, parse_intro, parse_links
+
+TOPIC = "Logic"
+MAX_LINKS = 20
+
+
+def build_page(paragraphs):
+    """Builds a parse-API style HTML body with linked, cited paragraphs and a heading."""
+    body = []
+    for i in range(paragraphs):
+        body.append(
+            f"<p>Paragraph {i} about <a href=\"/wiki/Topic_{i % 500}\">topic {i % 500}</a>, "
+            f"<a href=\"/wiki/Concept_{i % 97}#Section\">a concept</a> and "
+            f"<a href=\"/wiki/Help:Contents\">help</a>.<sup>[{i}]</sup> "
+            + "Filler text for the paragraph. " * 20
+            + "</p>"
+        )
+        if i == paragraphs // 2:
+            body.append("<div class=\"mw-heading mw-heading2\"><h2>History</h2></div>")
+    return f"<div class=\"mw-parser-output\">{''.join(body)}</div>"
+
+
+def build_app():
+    """Creates the app with an in-process cache warmed for TOPIC."""
+    app = create_app()
+    cache.init_app(app, config={"CACHE_TYPE": "SimpleCache", "CACHE_THRESHOLD": 10000})
+
+    with app.app_context():
+        cache_set(f"article:{TOPIC}", "Logic is the study of correct reasoning. " * 50, delta=0.001)
+        cache_set(f"links:{TOPIC}:0:{MAX_LINKS}", {
+            "links": [f"Topic_{i}" for i in range(MAX_LINKS)],
+            "next_cursor": MAX_LINKS
+        }, delta=0.001)
+
+    return app
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_mode(mode, app, html, args):
+    """Runs readers and ingesters concurrently for `args.duration` seconds."""
+    latencies = []
+    ingests = 0
+    rejected = 0
+    errors = 0
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def reader():
+        nonlocal errors
+        client = app.test_client()
+        local = []
+        arrival = time.perf_counter()
+        while not stop.is_set():
+            # Requests arrive on a fixed schedule whether or not the thread gets to run
+            arrival += args.interval
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            response = client.get(f"/topic/{TOPIC}?max_links={MAX_LINKS}")
+            local.append((time.perf_counter() - arrival) * 1000)
+            if response.status_code != 200:
+                with lock:
+                    errors += 1
+        with lock:
+            latencies.extend(local)
+
+    def ingester():
+        nonlocal ingests, rejected
+        while not stop.is_set():
+            try:
+                if mode == "inline":
+                    parse_intro(html)
+                    parse_links(html)
+                else:
+                    parsing_service.parse_intro(html)
+                    parsing_service.parse_links(html)
+            except ParserBusyError:
+                with lock:
+                    rejected += 1
+                continue
+            with lock:
+                ingests += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=ingester) for _ in range(args.ingesters)]
+
+    # The routes log every request; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print(f"\n[{mode}] {len(latencies)} cache hits ({errors} errors), {ingests} ingests, {rejected} rejected")
+    print(f"  p50: {statistics.median(latencies):.2f} ms")
+    print(f"  p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  max: {max(latencies):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent cache-hit request threads")
+    parser.add_argument("--ingesters", type=int, default=4, help="Concurrent cold ingest threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run each mode")
+    parser.add_argument("--paragraphs", type=int, default=400, help="Paragraphs in the synthetic page")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between a reader's requests")
+    parser.add_argument("--workers", type=int, default=2, help="Parser pool worker processes")
+    args = parser.parse_args()
+
+    html = build_page(args.paragraphs)
+    print(f"Synthetic page: {len(html) / 1024:.0f} KiB")
+
+    app = build_app()
+    parsing_service.max_workers = args.workers
+    parsing_service.parse_intro(html)  # Warm up the pool so worker start-up isn't measured
+
+    try:
+        run_mode("baseline", app, html, argparse.Namespace(**{**vars(args), "ingesters": 0}))
+        run_mode("inline", app, html, args)
+        run_mode("pool", app, html, args)
+    finally:
+        parsing_service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
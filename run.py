@@ -1,7 +1,7 @@
 # run.py
 from app import create_app
 
-app = create_app()
-
+# Parser pool workers re-import this script as __mp_main__, so only build the app when run directly
 if __name__ == "__main__":
+    app = create_app()
     app.run(debug=True)